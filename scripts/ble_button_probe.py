@@ -9,8 +9,10 @@ the raw IDR plus active-low pressed mask.
 
 import argparse
 import asyncio
-import binascii
+import operator
+import struct
 import sys
+from functools import lru_cache, reduce
 from typing import List, Optional
 
 try:
@@ -29,16 +31,17 @@ RESP_READ_MEM = CMD_READ_MEM | 0x80
 
 GPIOC_IDR_ADDR = 0x40011008
 
+READ_REQ = struct.Struct(">IB")  # addr, len
 
+
+@lru_cache(maxsize=256)
 def pack_frame(cmd: int, payload: bytes) -> bytes:
     if len(payload) > 255:
         raise ValueError("payload too long")
-    hdr = bytes([SOF, cmd & 0xFF, len(payload) & 0xFF])
-    x = 0
-    for b in hdr + payload:
-        x ^= b
-    cks = (~x) & 0xFF
-    return hdr + payload + bytes([cks])
+    n = len(payload)
+    cmd &= 0xFF
+    cks = (~reduce(operator.xor, payload, SOF ^ cmd ^ n)) & 0xFF
+    return struct.pack(f"<BBB{n}sB", SOF, cmd, n, payload, cks)
 
 
 class FrameParser:
@@ -46,26 +49,33 @@ class FrameParser:
         self.buf = bytearray()
 
     def feed(self, data: bytes) -> List[bytes]:
-        self.buf.extend(data)
+        buf = self.buf
+        buf.extend(data)
         out = []
+        pos = 0
         while True:
-            if len(self.buf) < 4:
+            avail = len(buf) - pos
+            if avail < 4:
                 break
-            if self.buf[0] != SOF:
-                del self.buf[0]
+            if buf[pos] != SOF:
+                # Resync: jump straight to the next SOF candidate.
+                pos = buf.find(SOF, pos + 1)
+                if pos < 0:
+                    pos = len(buf)
+                    break
                 continue
-            plen = self.buf[2]
+            plen = buf[pos + 2]
             total = 4 + plen
-            if len(self.buf) < total:
+            if avail < total:
                 break
-            frame = bytes(self.buf[:total])
-            del self.buf[:total]
-            x = 0
-            for b in frame[:-1]:
-                x ^= b
-            if ((~x) & 0xFF) != frame[-1]:
+            frame = bytes(buf[pos : pos + total])
+            pos += total
+            # CHKSUM = ~XOR(prior bytes), so XOR over the whole frame is 0xFF.
+            if reduce(operator.xor, frame, 0) != 0xFF:
                 continue
             out.append(frame)
+        # Drop consumed bytes once per feed instead of once per frame.
+        del buf[:pos]
         return out
 
 
@@ -81,7 +91,7 @@ class BleProbe:
 
     def _on_notify(self, _handle, data: bytes):
         if self.verbose:
-            print(f"[notify] {binascii.hexlify(data).decode()}")
+            print(f"[notify] {data.hex()}")
         for frame in self.parser.feed(data):
             self.frames.put_nowait(frame)
 
@@ -98,15 +108,14 @@ class BleProbe:
     async def read_mem(self, addr: int, size: int, timeout: float,
                        retries: int = 5, reconnect_delay: float = 0.5,
                        connect_timeout: float = 10.0) -> bytes:
-        payload = addr.to_bytes(4, "big") + bytes([size & 0xFF])
-        frame = pack_frame(CMD_READ_MEM, payload)
+        frame = pack_frame(CMD_READ_MEM, READ_REQ.pack(addr, size & 0xFF))
         attempt = 0
         while True:
             try:
                 if not self.client or not self.client.is_connected:
                     await self.connect(connect_timeout)
                 if self.verbose:
-                    print(f"[tx] {binascii.hexlify(frame).decode()}")
+                    print(f"[tx] {frame.hex()}")
                 await self.client.write_gatt_char(self.rx_uuid, frame, response=True)
                 while True:
                     fr = await asyncio.wait_for(self.frames.get(), timeout=timeout)
@@ -138,7 +147,7 @@ async def find_device(name_hint: Optional[str], timeout: float) -> str:
 
 
 def format_bits(v: int, width: int = 8) -> str:
-    return "".join("1" if (v & (1 << i)) else "0" for i in range(width - 1, -1, -1))
+    return format(v & ((1 << width) - 1), f"0{width}b")
 
 
 async def main() -> None:
@@ -14,9 +14,11 @@ Frame format: 0x55 | CMD | LEN | PAYLOAD | CHKSUM
 
 import argparse
 import asyncio
-import binascii
+import operator
 import os
+import struct
 import sys
+from functools import lru_cache, reduce
 from typing import List
 
 try:
@@ -34,18 +36,22 @@ CMD_READ_FLASH = 0x08
 
 RESP_READ_MEM = CMD_READ_MEM | 0x80
 RESP_READ_FLASH = CMD_READ_FLASH | 0x80
+CMD_TO_RESP = {CMD_READ_MEM: RESP_READ_MEM, CMD_READ_FLASH: RESP_READ_FLASH}
 CMD_SET_DEBUG_OUTPUT = 0x0F
 
+OUT_BUFFER_BYTES = 128 * 1024
 
+READ_REQ = struct.Struct(">IB")  # addr, len
+
+
+@lru_cache(maxsize=256)
 def pack_frame(cmd: int, payload: bytes) -> bytes:
     if len(payload) > 255:
         raise ValueError("payload too long")
-    hdr = bytes([0x55, cmd & 0xFF, len(payload) & 0xFF])
-    x = 0
-    for b in hdr + payload:
-        x ^= b
-    cks = (~x) & 0xFF
-    return hdr + payload + bytes([cks])
+    n = len(payload)
+    cmd &= 0xFF
+    cks = (~reduce(operator.xor, payload, 0x55 ^ cmd ^ n)) & 0xFF
+    return struct.pack(f"<BBB{n}sB", 0x55, cmd, n, payload, cks)
 
 
 class FrameParser:
@@ -53,31 +59,38 @@ class FrameParser:
         self.buf = bytearray()
 
     def feed(self, data: bytes) -> List[bytes]:
-        self.buf.extend(data)
+        buf = self.buf
+        buf.extend(data)
         out = []
+        pos = 0
         while True:
-            if len(self.buf) < 4:
+            avail = len(buf) - pos
+            if avail < 4:
                 break
-            if self.buf[0] != 0x55:
-                del self.buf[0]
+            if buf[pos] != 0x55:
+                # Resync: jump straight to the next SOF candidate.
+                pos = buf.find(0x55, pos + 1)
+                if pos < 0:
+                    pos = len(buf)
+                    break
                 continue
-            payload_len = self.buf[2]
+            payload_len = buf[pos + 2]
             frame_len = 4 + payload_len
-            if len(self.buf) < frame_len:
+            if avail < frame_len:
                 break
-            frame = bytes(self.buf[:frame_len])
-            del self.buf[:frame_len]
+            frame = bytes(buf[pos : pos + frame_len])
+            pos += frame_len
             if not self._valid_checksum(frame):
                 continue
             out.append(frame)
+        # Drop consumed bytes once per feed instead of once per frame.
+        del buf[:pos]
         return out
 
     @staticmethod
     def _valid_checksum(frame: bytes) -> bool:
-        x = 0
-        for b in frame[:-1]:
-            x ^= b
-        return ((~x) & 0xFF) == frame[-1]
+        # CHKSUM = ~XOR(prior bytes), so XOR over the whole frame is 0xFF.
+        return reduce(operator.xor, frame, 0) == 0xFF
 
 
 class BleMemDumper:
@@ -92,7 +105,7 @@ class BleMemDumper:
 
     def _on_notify(self, _handle, data: bytes):
         if self.verbose:
-            print(f"[notify] {binascii.hexlify(data).decode()}")
+            print(f"[notify] {data.hex()}")
         for frame in self.parser.feed(data):
             self.frames.put_nowait(frame)
 
@@ -109,13 +122,33 @@ class BleMemDumper:
 
     async def _write(self, client: BleakClient, frame: bytes):
         if self.verbose:
-            print(f"[tx] {binascii.hexlify(frame).decode()}")
+            print(f"[tx] {frame.hex()}")
         await client.write_gatt_char(self.rx_uuid, frame, response=True)
 
-    async def read_block(self, client: BleakClient, addr: int, size: int, timeout: float, cmd: int) -> bytes:
-        payload = addr.to_bytes(4, "big") + bytes([size & 0xFF])
-        await self._write(client, pack_frame(cmd, payload))
-        resp_cmd = (cmd | 0x80) & 0xFF
+    def reset(self):
+        """Drop partial and queued frames (e.g. stale responses after a reconnect)."""
+        self.parser = FrameParser()
+        self.frames = asyncio.Queue()
+
+    async def read_batch(self, client: BleakClient, addr: int, sizes: List[int], timeout: float, cmd: int) -> bytes:
+        """Issue one read per entry in sizes back-to-back, then collect replies in order.
+
+        Responses carry no address, so they are matched FIFO. A lost reply always
+        ends in a timeout on the last read of the batch, never in shifted data.
+        """
+        for n in sizes:
+            await self.request_block(client, addr, n, cmd)
+            addr += n
+        out = bytearray()
+        for n in sizes:
+            out += await self.receive_block(n, timeout, cmd)
+        return bytes(out)
+
+    async def request_block(self, client: BleakClient, addr: int, size: int, cmd: int):
+        await self._write(client, pack_frame(cmd, READ_REQ.pack(addr, size & 0xFF)))
+
+    async def receive_block(self, size: int, timeout: float, cmd: int) -> bytes:
+        resp_cmd = CMD_TO_RESP[cmd]
         while True:
             frame = await asyncio.wait_for(self.frames.get(), timeout=timeout)
             if len(frame) >= 4 and frame[1] == resp_cmd and frame[2] == size:
@@ -134,6 +167,7 @@ async def main():
     ap.add_argument("--chunk", type=int, default=192, help="read size per request (<=192)")
     ap.add_argument("--flash", action="store_true",
                     help="use flash-read command (0x08) for external SPI flash offsets")
+    ap.add_argument("--pipeline", type=int, default=4, help="read requests sent per round-trip (1=lockstep)")
     ap.add_argument("--timeout", type=float, default=2.0, help="seconds to wait per response")
     ap.add_argument("--retries", type=int, default=20, help="reconnect attempts before giving up")
     ap.add_argument("--reconnect-delay", type=float, default=0.5, help="seconds to wait before reconnecting")
@@ -145,10 +179,14 @@ async def main():
     if args.chunk <= 0 or args.chunk > 192:
         print("chunk must be 1..192", file=sys.stderr)
         sys.exit(1)
+    if args.pipeline <= 0:
+        print("pipeline must be >= 1", file=sys.stderr)
+        sys.exit(1)
 
     dumper = BleMemDumper(args.mac, args.service, args.rx, args.tx, args.verbose)
     remaining = args.length
     addr = args.start
+    end = args.start + args.length
     retries_left = args.retries
     cmd = CMD_READ_FLASH if args.flash else CMD_READ_MEM
     debug_mask = None
@@ -158,7 +196,7 @@ async def main():
         debug_mask = args.debug_mask & 0xFF
 
     os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
-    with open(args.out, "wb") as f:
+    with open(args.out, "wb", buffering=OUT_BUFFER_BYTES) as f:
         client = None
         while remaining > 0:
             try:
@@ -167,11 +205,16 @@ async def main():
                     if debug_mask is not None:
                         await dumper._write(client, pack_frame(CMD_SET_DEBUG_OUTPUT, bytes([debug_mask])))
                         await asyncio.sleep(0.05)
-                n = args.chunk if remaining > args.chunk else remaining
-                data = await dumper.read_block(client, addr, n, args.timeout, cmd)
+                sizes = []
+                a = addr
+                while len(sizes) < args.pipeline and a < end:
+                    n = args.chunk if end - a > args.chunk else end - a
+                    sizes.append(n)
+                    a += n
+                data = await dumper.read_batch(client, addr, sizes, args.timeout, cmd)
                 f.write(data)
-                addr += n
-                remaining -= n
+                addr += len(data)
+                remaining -= len(data)
                 if args.verbose:
                     print(f"dumped 0x{addr:08X} ({args.length - remaining}/{args.length})")
             except Exception as exc:
@@ -186,11 +229,15 @@ async def main():
                 except Exception:
                     pass
                 client = None
+                dumper.reset()
                 await asyncio.sleep(args.reconnect_delay)
 
         if client is not None and client.is_connected:
             await client.disconnect()
 
+        f.flush()
+        os.fsync(f.fileno())
+
     print(f"OK: wrote {args.length} bytes to {args.out}")
 
 
@@ -12,9 +12,10 @@ Command:
 
 import argparse
 import asyncio
-import binascii
+import operator
 import sys
 import re
+from functools import reduce
 from typing import Optional, Tuple
 
 try:
@@ -27,37 +28,38 @@ AVENTON_SERVICE_UUID = "0000ffe0-0000-1000-8000-00805f9b34fb"
 AVENTON_WRITE_UUID = "0000ffe9-0000-1000-8000-00805f9b34fb"
 AVENTON_NOTIFY_UUID = "0000ffe4-0000-1000-8000-00805f9b34fb"
 
+# OEM pattern: e.g. "Tv610u-123456" (prefix 6 chars, dash, digits)
+AVENTON_NAME_RE = re.compile(r"^[A-Za-z0-9]{6}-\d+$")
+
 
 def pack_frame(cmd: int, payload: bytes = b"") -> bytes:
     if len(payload) > 255:
         raise ValueError("payload too long")
     hdr = bytes([0x55, cmd & 0xFF, len(payload) & 0xFF])
-    x = 0
-    for b in hdr + payload:
-        x ^= b
-    cks = (~x) & 0xFF
+    cks = (~reduce(operator.xor, payload, hdr[0] ^ hdr[1] ^ hdr[2])) & 0xFF
     return hdr + payload + bytes([cks])
 
 
 def _looks_like_aventon_name(name: str) -> bool:
-    # OEM pattern: e.g. "Tv610u-123456" (prefix 6 chars, dash, digits)
-    return bool(re.match(r"^[A-Za-z0-9]{6}-\\d+$", name))
+    return AVENTON_NAME_RE.match(name) is not None
 
 
 async def _find_device(name_hint: Optional[str], timeout: float) -> Tuple[str, Optional[str]]:
     """Return (address, name) of the first matching device by name."""
     print(f"[*] Scanning for Aventon devices ({timeout:.1f}s)...")
-    devices = await BleakScanner.discover(timeout=timeout)
     name_hint_l = name_hint.lower() if name_hint else None
 
-    for d in devices:
-        name = d.name or ""
-        if name_hint_l and name_hint_l in name.lower():
-            return d.address, name
-        if not name_hint_l and _looks_like_aventon_name(name):
-            return d.address, name
+    def _matches(d, adv) -> bool:
+        name = d.name or adv.local_name or ""
+        if name_hint_l:
+            return name_hint_l in name.lower()
+        return _looks_like_aventon_name(name)
 
-    raise RuntimeError("No matching BLE device found")
+    # Stops scanning on the first matching advertisement instead of waiting out the timeout.
+    d = await BleakScanner.find_device_by_filter(_matches, timeout=timeout)
+    if d is None:
+        raise RuntimeError("No matching BLE device found")
+    return d.address, d.name
 
 
 async def _send_enter_bootloader(
@@ -70,7 +72,7 @@ async def _send_enter_bootloader(
 ) -> None:
     frame = pack_frame(0x20)
     if verbose:
-        print(f"[tx] {binascii.hexlify(frame).decode()}")
+        print(f"[tx] {frame.hex()}")
     client = BleakClient(address, timeout=connect_timeout)
     await client.connect()
     try:
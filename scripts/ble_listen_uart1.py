@@ -5,7 +5,6 @@ Listen to UART1 BLE notifications and print raw bytes as hex/ascii.
 
 import argparse
 import asyncio
-import binascii
 import sys
 
 try:
@@ -43,7 +42,7 @@ async def main():
     args = ap.parse_args()
 
     def on_notify(_handle, data: bytes):
-        hx = binascii.hexlify(data).decode()
+        hx = data.hex()
         asc = _format_ascii(data)
         print(f"[notify] {hx} | {asc}")
 
@@ -10,8 +10,9 @@ Uses CMD 0x02 (read32) and CMD 0x03 (write32) to configure:
 
 import argparse
 import asyncio
-import binascii
+import operator
 import sys
+from functools import reduce
 
 try:
     from bleak import BleakClient
@@ -42,10 +43,7 @@ def pack_frame(cmd: int, payload: bytes) -> bytes:
     if len(payload) > 255:
         raise ValueError("payload too long")
     hdr = bytes([0x55, cmd & 0xFF, len(payload) & 0xFF])
-    x = 0
-    for b in hdr + payload:
-        x ^= b
-    cks = (~x) & 0xFF
+    cks = (~reduce(operator.xor, payload, hdr[0] ^ hdr[1] ^ hdr[2])) & 0xFF
     return hdr + payload + bytes([cks])
 
 
@@ -54,31 +52,38 @@ class FrameParser:
         self.buf = bytearray()
 
     def feed(self, data: bytes):
-        self.buf.extend(data)
+        buf = self.buf
+        buf.extend(data)
         out = []
+        pos = 0
         while True:
-            if len(self.buf) < 4:
+            avail = len(buf) - pos
+            if avail < 4:
                 break
-            if self.buf[0] != 0x55:
-                del self.buf[0]
+            if buf[pos] != 0x55:
+                # Resync: jump straight to the next SOF candidate.
+                pos = buf.find(0x55, pos + 1)
+                if pos < 0:
+                    pos = len(buf)
+                    break
                 continue
-            payload_len = self.buf[2]
+            payload_len = buf[pos + 2]
             frame_len = 4 + payload_len
-            if len(self.buf) < frame_len:
+            if avail < frame_len:
                 break
-            frame = bytes(self.buf[:frame_len])
-            del self.buf[:frame_len]
+            frame = bytes(buf[pos : pos + frame_len])
+            pos += frame_len
             if not self._valid_checksum(frame):
                 continue
             out.append(frame)
+        # Drop consumed bytes once per feed instead of once per frame.
+        del buf[:pos]
         return out
 
     @staticmethod
     def _valid_checksum(frame: bytes) -> bool:
-        x = 0
-        for b in frame[:-1]:
-            x ^= b
-        return ((~x) & 0xFF) == frame[-1]
+        # CHKSUM = ~XOR(prior bytes), so XOR over the whole frame is 0xFF.
+        return reduce(operator.xor, frame, 0) == 0xFF
 
 
 class BleRw32:
@@ -93,7 +98,7 @@ class BleRw32:
 
     def _on_notify(self, _handle, data: bytes):
         if self.verbose:
-            print(f"[notify] {binascii.hexlify(data).decode()}")
+            print(f"[notify] {data.hex()}")
         for frame in self.parser.feed(data):
             self.frames.put_nowait(frame)
 
@@ -109,7 +114,7 @@ class BleRw32:
 
     async def write_frame(self, client: BleakClient, frame: bytes):
         if self.verbose:
-            print(f"[tx] {binascii.hexlify(frame).decode()}")
+            print(f"[tx] {frame.hex()}")
         await client.write_gatt_char(self.rx_uuid, frame, response=True)
 
     async def read32(self, client: BleakClient, addr: int, timeout: float) -> int:
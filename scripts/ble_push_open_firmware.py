@@ -20,37 +20,66 @@ Defaults target the Aventon OEM BLE service/characteristics:
   RX char (write):  0000ffe9-0000-1000-8000-00805f9b34fb
 
 If your device exposes different UUIDs, pass --service/--rx/--tx.
+
+If uvloop is installed (pip install uvloop) it is used as the event loop.
 """
 
 import argparse
 import asyncio
-import binascii
 import math
+import operator
 import os
 import sys
-from typing import Optional
+from collections import deque
+from functools import lru_cache, reduce
+from typing import Deque, List, Optional
 
 try:
-    from bleak import BleakClient
+    from bleak import BleakClient, BleakScanner
 except ImportError:
     print("Install bleak: pip install bleak", file=sys.stderr)
     sys.exit(1)
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 NUS_SERVICE = "0000ffe0-0000-1000-8000-00805f9b34fb"
 NUS_RX = "0000ffe9-0000-1000-8000-00805f9b34fb"  # write
 NUS_TX = "0000ffe4-0000-1000-8000-00805f9b34fb"  # notify
 
+ATT_HEADER_LEN = 3  # opcode + handle; write-without-response payload is MTU - 3
+OTA_FRAME_LEN = 4 + 4 + 0x80  # SOF/CMD/LEN/CHKSUM + block index + block
 
-def crc8_bootloader(data: bytes, poly: int = 0x8C, init: int = 0x00) -> int:
-    """CRC-8 used by OEM bootloader (reflected poly 0x8C, init 0x00, xorout 0x00)."""
-    crc = init & 0xFF
-    for b in data:
-        crc ^= b
+# Bootloader responses _expect can wait for: init, FW init, block write, complete.
+OTA_RESP_CMDS = frozenset((0x01, 0x23, 0x25, 0x27))
+
+REBOOT_SETTLE_S = 0.5  # let the app drop off the air before scanning
+REBOOT_ADV_TIMEOUT_S = 6.0
+
+
+@lru_cache(maxsize=None)
+def _crc8_table(poly: int) -> bytes:
+    """Byte-wise lookup table for the reflected CRC-8 with the given poly."""
+    tbl = bytearray(256)
+    for i in range(256):
+        crc = i
         for _ in range(8):
             if crc & 1:
                 crc = ((crc >> 1) ^ poly) & 0xFF
             else:
                 crc = (crc >> 1) & 0xFF
+        tbl[i] = crc
+    return bytes(tbl)
+
+
+def crc8_bootloader(data: bytes, poly: int = 0x8C, init: int = 0x00) -> int:
+    """CRC-8 used by OEM bootloader (reflected poly 0x8C, init 0x00, xorout 0x00)."""
+    tbl = _crc8_table(poly & 0xFF)
+    crc = init & 0xFF
+    for b in data:
+        crc = tbl[crc ^ b]
     return crc
 
 
@@ -58,13 +87,49 @@ def pack_frame(cmd: int, payload: bytes = b"") -> bytes:
     if len(payload) > 255:
         raise ValueError("payload too long")
     hdr = bytes([0x55, cmd & 0xFF, len(payload) & 0xFF])
-    x = 0
-    for b in hdr + payload:
-        x ^= b
-    cks = (~x) & 0xFF
+    cks = (~reduce(operator.xor, payload, hdr[0] ^ hdr[1] ^ hdr[2])) & 0xFF
     return hdr + payload + bytes([cks])
 
 
+class FrameParser:
+    def __init__(self):
+        self.buf = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        buf = self.buf
+        buf.extend(data)
+        out = []
+        pos = 0
+        while True:
+            avail = len(buf) - pos
+            if avail < 4:
+                break
+            if buf[pos] != 0x55:
+                # Resync: jump straight to the next SOF candidate.
+                pos = buf.find(0x55, pos + 1)
+                if pos < 0:
+                    pos = len(buf)
+                    break
+                continue
+            payload_len = buf[pos + 2]
+            frame_len = 4 + payload_len
+            if avail < frame_len:
+                break
+            frame = bytes(buf[pos : pos + frame_len])
+            pos += frame_len
+            if not self._valid_checksum(frame):
+                continue
+            out.append(frame)
+        # Drop consumed bytes once per feed instead of once per frame.
+        del buf[:pos]
+        return out
+
+    @staticmethod
+    def _valid_checksum(frame: bytes) -> bool:
+        # CHKSUM = ~XOR(prior bytes), so XOR over the whole frame is 0xFF.
+        return reduce(operator.xor, frame, 0) == 0xFF
+
+
 def chunk_blocks(image: bytes, block_size: int = 0x80):
     for i in range(0, len(image), block_size):
         yield i // block_size, image[i : i + block_size]
@@ -78,36 +143,64 @@ class OtaSession:
         self.tx_uuid = tx_uuid
         self.image = image
         self.verbose = verbose
-        self.rx_queue = asyncio.Queue()
+        # Single consumer (_expect): a deque plus one waiter future is all the
+        # notify path needs, without Queue's per-item getter bookkeeping.
+        self.parser = FrameParser()
+        self.rx_frames: Deque[bytes] = deque()
+        self._rx_waiter: Optional[asyncio.Future] = None
         self.crc_poly = crc_poly
         self.crc_init = crc_init
+        self.mtu = 23
 
-    async def _connect(self) -> BleakClient:
-        client = BleakClient(self.mac)
+    async def _acquire_mtu(self, client: BleakClient):
+        # BlueZ negotiates the MTU on connect but only reports it once acquired;
+        # other backends fill mtu_size themselves.
+        backend = getattr(client, "_backend", None)
+        if hasattr(backend, "_acquire_mtu"):
+            try:
+                await backend._acquire_mtu()
+            except Exception:
+                pass
+        self.mtu = getattr(client, "mtu_size", 23)
+        if self.verbose:
+            print(f"[*] ATT MTU {self.mtu}")
+
+    async def _connect(self, timeout: float = 10.0) -> BleakClient:
+        client = BleakClient(self.mac, timeout=timeout)
         await client.connect()
+        self.parser = FrameParser()  # drop any partial frame from the previous link
         # Ensure services are discovered on macOS before writes.
         if hasattr(client, "get_services"):
             await client.get_services()
         else:
             _ = client.services
         await client.start_notify(self.tx_uuid, self._on_notify)
+        await self._acquire_mtu(client)
         return client
 
     def _on_notify(self, _handle, data: bytes):
         if self.verbose:
-            print(f"[notify] {binascii.hexlify(data).decode()}")
-        self.rx_queue.put_nowait(data)
-
-    async def _write(self, client: BleakClient, frame: bytes):
+            print(f"[notify] {data.hex()}")
+        got = False
+        for frame in self.parser.feed(data):
+            # Anything that is not a bootloader response can never satisfy _expect.
+            if frame[1] in OTA_RESP_CMDS:
+                self.rx_frames.append(frame)
+                got = True
+        waiter = self._rx_waiter
+        if got and waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def _write(self, client: BleakClient, frame: bytes, response: bool = True):
         if self.verbose:
-            print(f"[tx] {binascii.hexlify(frame).decode()}")
-        await client.write_gatt_char(self.rx_uuid, frame, response=True)
+            print(f"[tx] {frame.hex()}")
+        await client.write_gatt_char(self.rx_uuid, frame, response=response)
 
-    async def _write_with_reconnect(self, client: BleakClient, frame: bytes, connect_timeout: float, write_timeout: float) -> BleakClient:
+    async def _write_with_reconnect(
+        self, client: BleakClient, frame: bytes, connect_timeout: float, write_timeout: float, response: bool = True
+    ) -> BleakClient:
         try:
-            if hasattr(client, "get_services"):
-                await client.get_services()
-            await asyncio.wait_for(self._write(client, frame), timeout=write_timeout)
+            await asyncio.wait_for(self._write(client, frame, response), timeout=write_timeout)
             return client
         except Exception as e:
             # Retry once after reconnect if services aren't ready or link dropped
@@ -118,24 +211,44 @@ class OtaSession:
             except Exception:
                 pass
             await asyncio.sleep(0.3)
-            client = BleakClient(self.mac, timeout=connect_timeout)
-            await client.connect()
-            if hasattr(client, "get_services"):
-                await client.get_services()
-            else:
-                _ = client.services
-            await client.start_notify(self.tx_uuid, self._on_notify)
-            await asyncio.wait_for(self._write(client, frame), timeout=write_timeout)
+            client = await self._connect(connect_timeout)
+            await asyncio.wait_for(self._write(client, frame, response), timeout=write_timeout)
             return client
 
+    def _drain_rx(self):
+        self.rx_frames.clear()
+
+    async def _write_blocks(self, client: BleakClient, first_idx: int, frames: List[bytes], block_timeout: float) -> BleakClient:
+        """Send block frames back-to-back, then collect one 0x25 ack per frame in order.
+
+        Acks carry no block index, so a lost ack surfaces as a timeout on the batch
+        rather than as a status attributed to the wrong block.
+        """
+        # Only skip the ATT write response when acks pace the batch and the
+        # frame fits a single write-without-response PDU.
+        response = len(frames) == 1 or self.mtu - ATT_HEADER_LEN < len(frames[0])
+        for frame in frames:
+            client = await self._write_with_reconnect(client, frame, block_timeout, block_timeout, response)
+        for i in range(len(frames)):
+            r = await self._expect(0x25, timeout=block_timeout)
+            if len(r) < 4 or r[3] != 0:
+                raise RuntimeError(f"block {first_idx + i} write failed (status {r[3] if len(r) >= 4 else '??'})")
+        return client
+
     async def _expect(self, cmd: int, timeout: float = 2.0) -> bytes:
-        try:
-            while True:
-                data = await asyncio.wait_for(self.rx_queue.get(), timeout=timeout)
+        rx = self.rx_frames
+        while True:
+            while rx:
+                data = rx.popleft()
                 if len(data) >= 2 and data[1] == cmd:
                     return data
-        except asyncio.TimeoutError:
-            raise RuntimeError(f"Timeout waiting for cmd 0x{cmd:02X}")
+            self._rx_waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self._rx_waiter, timeout=timeout)
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"Timeout waiting for cmd 0x{cmd:02X}")
+            finally:
+                self._rx_waiter = None
 
     async def enter_bootloader(self):
         print("[*] Connecting to APP and asking for bootloader...")
@@ -145,14 +258,18 @@ class OtaSession:
             await asyncio.sleep(0.5)
         finally:
             await client.disconnect()
-        print("[*] Device should reboot into bootloader; waiting 3s to re-advertise")
-        await asyncio.sleep(3.0)
+        print("[*] Device should reboot into bootloader; waiting for it to re-advertise")
+        await asyncio.sleep(REBOOT_SETTLE_S)
+        device = await BleakScanner.find_device_by_address(self.mac, timeout=REBOOT_ADV_TIMEOUT_S)
+        if device is None:
+            print(f"[warn] no advertisement from {self.mac} within {REBOOT_ADV_TIMEOUT_S:.0f}s; trying to connect anyway")
 
     async def program_bootloader(
         self,
         block_timeout: float,
         block_retries: int,
         inter_block_ms: int,
+        pipeline: int,
         start_block: int,
         reconnect_every_blocks: int,
         reconnect_delay_ms: int,
@@ -204,31 +321,38 @@ class OtaSession:
             if start_block < 0 or start_block >= total_blocks:
                 raise RuntimeError(f"start_block {start_block} out of range (0..{total_blocks-1})")
 
+            if pipeline > 1 and self.mtu - ATT_HEADER_LEN < OTA_FRAME_LEN:
+                print(f"[warn] ATT MTU {self.mtu} < {OTA_FRAME_LEN + ATT_HEADER_LEN}; pipelined blocks use acknowledged writes")
+
+            # Pack every block frame up front so the write loop only does BLE I/O.
+            block_frames = [
+                pack_frame(0x24, idx.to_bytes(4, "big") + block.ljust(0x80, b"\xFF"))
+                for idx, block in chunk_blocks(self.image)
+            ]
+
             sent_since_reconnect = 0
-            for idx, block in chunk_blocks(self.image):
-                if idx < start_block:
-                    continue
-                blk_payload = idx.to_bytes(4, "big") + block.ljust(0x80, b"\xFF")
+            for first_idx in range(start_block, total_blocks, pipeline):
+                frames = block_frames[first_idx : first_idx + pipeline]
                 attempt = 0
                 while True:
                     attempt += 1
                     try:
-                        client = await self._write_with_reconnect(client, pack_frame(0x24, blk_payload), block_timeout, block_timeout)
-                        r = await self._expect(0x25, timeout=block_timeout)
-                        if len(r) < 4 or r[3] != 0:
-                            raise RuntimeError(f"block {idx} write failed (status {r[3] if len(r) >= 4 else '??'})")
+                        client = await self._write_blocks(client, first_idx, frames, block_timeout)
                         break
                     except Exception as e:
                         if attempt > block_retries:
-                            raise RuntimeError(f"block {idx} write failed after {block_retries} retries: {e}") from e
+                            raise RuntimeError(f"block {first_idx} write failed after {block_retries} retries: {e}") from e
                         if self.verbose:
-                            print(f"    retry block {idx} (attempt {attempt}/{block_retries})")
+                            print(f"    retry block {first_idx} (attempt {attempt}/{block_retries})")
                         await asyncio.sleep(0.05)
-                if (progress_every and ((idx + 1) % progress_every == 0)) or (idx + 1 == total_blocks):
-                    print(f"[*] wrote block {idx+1}/{total_blocks}")
+                        # Late acks from the failed attempt must not satisfy the retry.
+                        self._drain_rx()
+                for idx in range(first_idx, first_idx + len(frames)):
+                    if (progress_every and ((idx + 1) % progress_every == 0)) or (idx + 1 == total_blocks):
+                        print(f"[*] wrote block {idx+1}/{total_blocks}")
                 if inter_block_ms:
                     await asyncio.sleep(inter_block_ms / 1000.0)
-                sent_since_reconnect += 1
+                sent_since_reconnect += len(frames)
                 if reconnect_every_blocks > 0 and sent_since_reconnect >= reconnect_every_blocks:
                     if self.verbose:
                         print(f"    reconnecting after {sent_since_reconnect} blocks")
@@ -258,7 +382,10 @@ async def main():
     ap.add_argument("--assume-bootloader", action="store_true", help="skip app->bootloader jump; already in BLE update mode")
     ap.add_argument("--block-timeout", type=float, default=6.0, help="seconds to wait per block ack/response")
     ap.add_argument("--block-retries", type=int, default=3, help="retries per block before failing")
-    ap.add_argument("--inter-block-ms", type=int, default=10, help="delay between blocks (ms)")
+    ap.add_argument("--inter-block-ms", type=int, default=0,
+                    help="extra delay between blocks (ms); acks already pace writes, only for peripherals that drop back-to-back frames")
+    ap.add_argument("--pipeline", type=int, default=1,
+                    help="blocks sent per ack round-trip (1=lockstep; bootloader RX ring is 200 bytes)")
     ap.add_argument("--start-block", type=int, default=0, help="start from block index (for resume)")
     ap.add_argument("--reconnect-every-blocks", type=int, default=0, help="disconnect/reconnect every N blocks (0=disabled)")
     ap.add_argument("--reconnect-delay-ms", type=int, default=300, help="delay before reconnect (ms)")
@@ -267,6 +394,10 @@ async def main():
     ap.add_argument("--crc-init", type=lambda s: int(s, 0), default=0x00, help="CRC8 init (default 0x00)")
     args = ap.parse_args()
 
+    if args.pipeline <= 0:
+        print("pipeline must be >= 1", file=sys.stderr)
+        sys.exit(1)
+
     if not os.path.isfile(args.bin):
         print(f"Firmware not found: {args.bin}", file=sys.stderr)
         sys.exit(1)
@@ -281,6 +412,7 @@ async def main():
         args.block_timeout,
         args.block_retries,
         args.inter_block_ms,
+        args.pipeline,
         args.start_block,
         args.reconnect_every_blocks,
         args.reconnect_delay_ms,
@@ -290,6 +422,9 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         pass